@@ -1,16 +1,30 @@
 import datetime
+import multiprocessing
 import sys
 import time
 from logging import Logger
 from sys import platform as os_platform
 
+import aithre_config
+import aithre_profiler
+from aithre_alarms import AlarmEngine, AlarmThreshold
+from aithre_deadline import run_with_deadline
+from aithre_profiler import timing_span
 from aithre_task import AithreTask
+from aithre_worker import BleWorker
 
 IS_LINUX = 'linux' in os_platform
 
+# The BlueTooth worker process imports this module as well,
+# but must leave the update task to the main process.
+IS_MAIN_PROCESS = multiprocessing.current_process().name == 'MainProcess'
+
 if IS_LINUX:
     from bluepy.btle import UUID, Peripheral, Scanner, DefaultDelegate
 
+for config_error in aithre_config.load():
+    print("Config error: {}".format(config_error))
+
 
 # The Aithre is always expected to have a public address
 AITHRE_ADDR_TYPE = "public"
@@ -25,7 +39,26 @@ CO_OFFSET = "BCD466FE07034D85A021AE8B771E4922"
 # The value will be 0 to 100 inclusive.
 BAT_OFFSET = "24509DDEFCD711E88EB2F2801F1B9FD1"
 
+# The minimum number of seconds between reads of each characteristic.
+# The CO level is read every cycle, while the battery percentage
+# changes over hours and does not need the extra GATT traffic.
+CO_REFRESH_INTERVAL = aithre_config.get('co_refresh_interval')
+BATTERY_REFRESH_INTERVAL = aithre_config.get('battery_refresh_interval')
+
 AITHRE_DEVICE_NAME = "AITHRE"
+
+# Where each reading is found in the levels of a snapshot
+CO_LEVEL_INDEX = 0
+BATTERY_LEVEL_INDEX = 1
+
+SPO2_LEVEL_INDEX = 0
+HEARTRATE_INDEX = 1
+SIGNAL_STRENGTH_INDEX = 2
+
+# The names of the readings that are watched for alarms.
+# An alarm on an Aithre reading shares its characteristic's name.
+CO_ALARM_NAME = "co"
+SPO2_ALARM_NAME = "spo2"
 ILLYRIAN_BEACON_SUFFIX = "696C6C70"
 
 
@@ -48,44 +81,159 @@ def get_service_value(
     if not IS_LINUX:
         return 0
 
-    try:
-        p = Peripheral(addr, addr_type)
-        ch_all = p.getCharacteristics(uuid=offset)
+    peripheral = Peripheral()
 
-        if ch_all[0].supportsRead():
-            res = ch_all[0].read()
+    def __cancel__():
+        abort_bluepy_helper(peripheral)
 
-        p.disconnect()
+    try:
+        with timing_span("get_service_value.connect"):
+            run_with_deadline(
+                "connect",
+                get_operation_budget(CONNECT_BUDGET_FRACTION),
+                lambda: peripheral.connect(addr, addr_type),
+                __cancel__)
+
+        with timing_span("get_service_value.discovery"):
+            ch_all = run_with_deadline(
+                "discovery",
+                get_operation_budget(DISCOVERY_BUDGET_FRACTION),
+                lambda: peripheral.getCharacteristics(uuid=offset),
+                __cancel__)
+
+        with timing_span("get_service_value.read"):
+            if ch_all[0].supportsRead():
+                res = run_with_deadline(
+                    "read",
+                    get_operation_budget(READ_BUDGET_FRACTION),
+                    ch_all[0].read,
+                    __cancel__)
 
         return ord(res)
     except Exception as ex:
         print("   ex in get_name={}".format(ex))
+    finally:
+        try:
+            with timing_span("get_service_value.disconnect"):
+                run_with_deadline(
+                    "disconnect",
+                    get_operation_budget(DISCONNECT_BUDGET_FRACTION),
+                    peripheral.disconnect,
+                    __cancel__)
+        except Exception as ex:
+            print("   ex in disconnect={}".format(ex))
 
     return None
 
 
-def get_aithre(
-    mac_adr: str
+class Characteristic(object):
+    """
+    A GATT characteristic to read from a device,
+    and how often it needs to be read.
+    """
+
+    __slots__ = ('name', 'uuid', 'refresh_interval', 'is_read_forced')
+
+    def __init__(
+        self,
+        name: str,
+        uuid: str,
+        refresh_interval: float
+    ):
+        """
+        Creates a new characteristic.
+
+        Arguments:
+            name {string} -- The name of the reading, used for logging.
+            uuid {string} -- The offset of the characteristic on the device.
+            refresh_interval {float} -- The minimum number of seconds between reads.
+        """
+        self.name = name
+        self.uuid = uuid
+        self.refresh_interval = refresh_interval
+        self.is_read_forced = False
+
+    def force_next_read(
+        self
+    ):
+        """
+        Makes the next update read the characteristic,
+        no matter when it was last read.
+        """
+        self.is_read_forced = True
+
+    def is_due(
+        self,
+        value,
+        last_read: datetime.datetime
+    ):
+        """
+        Does the characteristic need to be read again?
+
+        Arguments:
+            value -- The last value read, None if the read failed.
+            last_read {datetime} -- When the value was read, None if never.
+        Returns: {bool} -- True if the characteristic should be read.
+        """
+        if self.is_read_forced or value is None or value == OFFLINE or last_read is None:
+            return True
+
+        time_since_read = datetime.datetime.utcnow() - last_read
+
+        return time_since_read.total_seconds() >= self.refresh_interval
+
+
+def get_refresh_interval_key(
+    characteristic: Characteristic
+):
+    """
+    Returns the name of the setting that holds the refresh interval of the characteristic.
+    """
+    return "{}_refresh_interval".format(characteristic.name)
+
+
+def get_characteristic_values(
+    mac_adr: str,
+    addr_type: str,
+    characteristics: list,
+    previous_levels: tuple,
+    previous_timestamps: tuple
 ):
     """
-    Gets the current Aithre readings given a MAC for the Aithre
+    Reads the characteristics that are due, and carries over the
+    previous values of the ones that are not.
     Arguments:
-        mac_adr {string} -- The MAC address of the Aithre to fetch from.
-    Returns: {(int, int)} -- The co and battery percentage of the Aithre
+        mac_adr {string} -- The MAC address of the device to fetch from.
+        addr_type {string} -- The type of address we are using.
+        characteristics {list} -- The characteristics to read, in level order.
+        previous_levels {tuple} -- The levels from the last update, None if there are none.
+        previous_timestamps {tuple} -- When each of the previous levels was read.
+    Returns: {(tuple, tuple)} -- The levels and when each was read.
     """
+    levels = []
+    timestamps = []
 
-    co = get_service_value(mac_adr, AITHRE_ADDR_TYPE, CO_OFFSET)
-    bat = get_service_value(mac_adr, AITHRE_ADDR_TYPE, BAT_OFFSET)
+    for index, characteristic in enumerate(characteristics):
+        value = previous_levels[index] if previous_levels is not None else None
+        last_read = previous_timestamps[index] if previous_timestamps is not None else None
 
-    return co, bat
+        if characteristic.is_due(value, last_read):
+            characteristic.is_read_forced = False
+            value = get_service_value(mac_adr, addr_type, characteristic.uuid)
+            last_read = datetime.datetime.utcnow()
 
+        levels.append(value)
+        timestamps.append(last_read)
 
-def get_illyrian(
-    mac_adr: str
+    return tuple(levels), tuple(timestamps)
+
+
+def get_illyrian_levels(
+    illyrian: str
 ):
     """
-    Attempts to get the blood/pulse/oxygen levels from an Illyrian device
-        :param mac_adr: 
+    Decodes the blood/pulse/oxygen levels from an Illyrian beacon
+        :param illyrian: The beacon value, None if the device was not found.
     """
 
     # Example value:
@@ -95,8 +243,6 @@ def get_illyrian(
     #  41[R VALUE * 100][HEART RATE] [SIGNAL STRENGTH][SERIAL NO]696C6C70
     #  [00][0001][0008]
     #  [40][39][ff]
-    illyrian = get_value_by_name(ILLYRIAN_BEACON_SUFFIX)
-
     if illyrian is None:
         return (OFFLINE, OFFLINE, OFFLINE)
 
@@ -108,60 +254,100 @@ def get_illyrian(
     return (sp02, heartrate, signal_strength)
 
 
-def get_value_by_name(
-    name_to_find: str
+def abort_bluepy_helper(
+    bluepy_object
 ):
-    try:
-        if not IS_LINUX:
-            return None
+    """
+    Kills the bluepy-helper process behind a Peripheral or Scanner.
+    Any call blocked on the helper will then fail instead of waiting forever.
+    """
+    helper = getattr(bluepy_object, '_helper', None)
 
-        scanner = Scanner()
-        devices = scanner.scan(2)
-        for dev in devices:
-            print("    {} {} {}".format(dev.addr, dev.addrType, dev.rssi))
+    if helper is not None:
+        helper.kill()
 
-            for (adtype, desc, value) in dev.getScanData():
-                try:
-                    if name_to_find.lower() in value.lower():
-                        return value
-                except Exception as ex:
-                    print("DevScan loop - ex={}".format(ex))
 
-    except Exception as ex:
-        print("Outter loop ex={}".format(ex))
+def get_operation_budget(
+    fraction: float
+):
+    """
+    Returns the number of seconds a BlueTooth operation may take.
+    Arguments:
+        fraction {float} -- The portion of the update cycle the operation may use.
+    Returns: {float} -- The budget in seconds.
+    """
+    return SCAN_PERIOD * fraction
 
-    return None
 
+def scan_for_devices():
+    """
+    Scans for BlueTooth Low Energy devices.
+    The scan is aborted if it runs past its budget.
+    Returns: {list} -- The devices that were found.
+    """
+    scan_budget = get_operation_budget(SCAN_BUDGET_FRACTION)
+    scan_window = min(SCAN_WINDOW, scan_budget * 0.8)
+    scanner = Scanner()
 
-def get_mac_by_device_name(
+    return run_with_deadline(
+        "scan",
+        scan_budget,
+        lambda: scanner.scan(scan_window),
+        lambda: abort_bluepy_helper(scanner))
+
+
+def find_device_by_name(
     name_to_find: str
 ):
     """
-    Attempts to find an Aithre MAC using Blue Tooth low energy.
+    Scans once for a device whose advertised data contains the name.
     Arguments:
         name_to_find {string} -- The name (or partial name) to match the BLE info with.
-    Returns: {string} None if a device was not found, otherwise the MAC of the Aithre
+    Returns: {(string, string)} -- The MAC of the device and the matching value, both None if a device was not found.
     """
     try:
         if not IS_LINUX:
-            return None
+            return None, None
+
+        with timing_span("find_device_by_name.scan"):
+            devices = scan_for_devices()
 
-        scanner = Scanner()
-        devices = scanner.scan(2)
-        for dev in devices:
-            print("    {} {} {}".format(dev.addr, dev.addrType, dev.rssi))
+        with timing_span("find_device_by_name.match"):
+            for dev in devices:
+                print("    {} {} {}".format(dev.addr, dev.addrType, dev.rssi))
 
-            for (address_type, desc, value) in dev.getScanData():
-                try:
-                    if name_to_find.lower() in value.lower():
-                        return dev.addr
-                except Exception as ex:
-                    print("DevScan loop - ex={}".format(ex))
+                for (adtype, desc, value) in dev.getScanData():
+                    try:
+                        if name_to_find.lower() in value.lower():
+                            return dev.addr, value
+                    except Exception as ex:
+                        print("DevScan loop - ex={}".format(ex))
 
     except Exception as ex:
         print("Outter loop ex={}".format(ex))
 
-    return None
+    return None, None
+
+
+def get_value_by_name(
+    name_to_find: str
+):
+    """
+    Returns the advertised value that contains the name, None if a device was not found.
+    """
+    return find_device_by_name(name_to_find)[1]
+
+
+def get_mac_by_device_name(
+    name_to_find: str
+):
+    """
+    Attempts to find an Aithre MAC using Blue Tooth low energy.
+    Arguments:
+        name_to_find {string} -- The name (or partial name) to match the BLE info with.
+    Returns: {string} None if a device was not found, otherwise the MAC of the Aithre
+    """
+    return find_device_by_name(name_to_find)[0]
 
 
 def get_aithre_mac():
@@ -180,9 +366,115 @@ def get_illyrian_mac():
     return get_mac_by_device_name(ILLYRIAN_BEACON_SUFFIX)
 
 
-SCAN_PERIOD = 10
+SCAN_PERIOD = aithre_config.get('scan_period')
 OFFLINE = "OFFLINE"
 
+# When enabled, all of the BlueTooth work happens in a dedicated
+# worker process and the readings are streamed back to this one.
+# This keeps radio stalls from competing with the REST server.
+# Only read at start up, as the update task is already running by
+# the time a change could be applied.
+USE_BLE_WORKER_PROCESS = aithre_config.get('use_ble_worker_process')
+
+# How often the main process collects readings from the worker
+WORKER_SERVICE_INTERVAL = aithre_config.get('worker_service_interval')
+
+# How many update periods the worker may go without reporting before it is restarted.
+# Tied to the period so a slower period never looks like a hang.
+WORKER_HANG_PERIODS = aithre_config.get('worker_hang_periods')
+WORKER_HANG_TIMEOUT = SCAN_PERIOD * WORKER_HANG_PERIODS
+
+# The number of seconds to listen for devices during a scan
+SCAN_WINDOW = aithre_config.get('scan_window')
+
+# The portion of SCAN_PERIOD that each BlueTooth operation may use.
+# The worst case cycle is a scan for the Aithre, two characteristic
+# reads (each a connect, discovery, read and disconnect), and a scan
+# for the Illyrian, which must fit within the period.
+# aithre_config rejects settings where it does not.
+CONNECT_BUDGET_FRACTION = aithre_config.get('connect_budget_fraction')
+DISCOVERY_BUDGET_FRACTION = aithre_config.get('discovery_budget_fraction')
+READ_BUDGET_FRACTION = aithre_config.get('read_budget_fraction')
+DISCONNECT_BUDGET_FRACTION = aithre_config.get('disconnect_budget_fraction')
+SCAN_BUDGET_FRACTION = aithre_config.get('scan_budget_fraction')
+
+
+class SensorSnapshot(object):
+    """
+    Immutable set of readings taken from a sensor.
+
+    A new snapshot is published after every update and swapped in with a
+    single assignment, so readers always get values from the same cycle
+    with one reference load and no locks.
+    """
+
+    __slots__ = ('mac', 'levels', 'timestamps', 'is_connected')
+
+    def __init__(
+        self,
+        mac: str = None,
+        levels: tuple = None,
+        timestamps: tuple = None
+    ):
+        """
+        Creates a new snapshot.
+
+        Arguments:
+            mac {string} -- The MAC the readings were taken from.
+            levels {tuple} -- The readings, None if the sensor has not been read.
+            timestamps {tuple} -- The UTC time each reading was taken.
+        """
+        object.__setattr__(self, 'mac', mac)
+        object.__setattr__(self, 'levels', levels)
+        object.__setattr__(self, 'timestamps', timestamps)
+        object.__setattr__(
+            self,
+            'is_connected',
+            (mac is not None and levels is not None) or not IS_LINUX)
+
+    def __setattr__(
+        self,
+        name,
+        value
+    ):
+        raise AttributeError("SensorSnapshot is immutable")
+
+    def __delattr__(
+        self,
+        name
+    ):
+        raise AttributeError("SensorSnapshot is immutable")
+
+    def __reduce__(
+        self
+    ):
+        # Allows the snapshot to be sent from the BlueTooth worker process.
+        return (SensorSnapshot, (self.mac, self.levels, self.timestamps))
+
+    def get_level(
+        self,
+        index: int
+    ):
+        """
+        Returns the reading at the given index, or OFFLINE if there are no readings.
+        """
+        if self.levels is not None:
+            return self.levels[index]
+
+        return OFFLINE
+
+    def get_timestamp(
+        self,
+        index: int
+    ):
+        """
+        Returns when the reading at the given index was taken, or None if there are no readings.
+        """
+        if self.timestamps is not None:
+            return self.timestamps[index]
+
+        return None
+
 
 class BlueToothDevice(object):
     """
@@ -226,14 +518,55 @@ class BlueToothDevice(object):
         self,
         logger: Logger = None
     ):
+        # The device is not searched for here. The first update
+        # finds it, so the search counts against the update's budget.
         self.__logger__ = logger
 
         self.warn("Initializing new Aithre object")
 
         self._mac_ = None
-        self._levels_ = None
+        self._snapshot_ = SensorSnapshot()
+
+    def _publish_levels_(
+        self,
+        levels: tuple
+    ):
+        """
+        Publishes a new snapshot holding the given levels, all taken now.
+        """
+        now = datetime.datetime.utcnow()
+
+        self._publish_snapshot_(levels, tuple(now for level in levels))
+
+    def _publish_snapshot_(
+        self,
+        levels: tuple,
+        timestamps: tuple
+    ):
+        """
+        Publishes a new snapshot holding the given levels and when each was read.
+        """
+        self._snapshot_ = SensorSnapshot(self._mac_, levels, timestamps)
+
+    def get_snapshot(
+        self
+    ):
+        """
+        Returns the most recent snapshot of the readings.
+        """
+
+        return self._snapshot_
+
+    def set_snapshot(
+        self,
+        snapshot: SensorSnapshot
+    ):
+        """
+        Sets the readings from a snapshot that was collected by another process.
+        """
 
-        self._update_mac_()
+        self._mac_ = snapshot.mac
+        self._snapshot_ = snapshot
 
     def is_connected(
         self
@@ -242,7 +575,7 @@ class BlueToothDevice(object):
         Is the BlueTooth device currently connected and usable?
         """
 
-        return (self._mac_ is not None and self._levels_ is not None) or not IS_LINUX
+        return self._snapshot_.is_connected
 
     def update(
         self
@@ -260,18 +593,6 @@ class Illyrian(BlueToothDevice):
     ):
         super(Illyrian, self).__init__(logger=logger)
 
-    def _update_mac_(
-        self
-    ):
-        """
-        Updates the BlueTooth MAC that the Blood Oxygen sensor is on.
-        """
-        try:
-            self._mac_ = get_illyrian_mac()
-        except Exception as e:
-            self._mac_ = None
-            self.warn("Got EX={} during MAC update.".format(e))
-
     def _update_levels(
         self
     ):
@@ -280,10 +601,12 @@ class Illyrian(BlueToothDevice):
             :param self: 
         An example value is '410000010008696c6c70' when searching for the MAC.
         This is so the beacon can be used simultaneously by devices.
+        The MAC and the levels come from the same scan.
         """
         try:
-            new_levels = get_illyrian(self._mac_)
-            self._levels_ = new_levels
+            self._mac_, illyrian = find_device_by_name(ILLYRIAN_BEACON_SUFFIX)
+            new_levels = get_illyrian_levels(illyrian)
+            self._publish_levels_(new_levels)
         except:
             self.warn("Unable to get Illyrian levels")
 
@@ -295,10 +618,7 @@ class Illyrian(BlueToothDevice):
             :param self: 
         """
 
-        if self._levels_ is not None:
-            return self._levels_[0]
-
-        return OFFLINE
+        return self._snapshot_.get_level(SPO2_LEVEL_INDEX)
 
     def get_heartrate(
         self
@@ -308,10 +628,7 @@ class Illyrian(BlueToothDevice):
             :param self: 
         """
 
-        if self._levels_ is not None:
-            return self._levels_[1]
-
-        return OFFLINE
+        return self._snapshot_.get_level(HEARTRATE_INDEX)
 
     def get_signal_strength(
         self
@@ -321,13 +638,16 @@ class Illyrian(BlueToothDevice):
             :param self: 
         """
 
-        if self._levels_ is not None:
-            return self._levels_[2]
-
-        return OFFLINE
+        return self._snapshot_.get_level(SIGNAL_STRENGTH_INDEX)
 
 
 class Aithre(BlueToothDevice):
+    # The readings to take, in the order they appear in the levels.
+    CHARACTERISTICS = [
+        Characteristic("co", CO_OFFSET, CO_REFRESH_INTERVAL),
+        Characteristic("battery", BAT_OFFSET, BATTERY_REFRESH_INTERVAL)
+    ]
+
     def __init__(
         self,
         logger: Logger = None
@@ -359,15 +679,34 @@ class Aithre(BlueToothDevice):
                 self.warn("Aithre MAC is none, attempting to connect.")
                 self._update_mac_()
 
+        # Reading without a MAC can only fail, and would spend
+        # the read budgets on top of the scan that just missed.
+        if self._mac_ is None:
+            self._snapshot_ = SensorSnapshot(
+                None,
+                self._snapshot_.levels,
+                self._snapshot_.timestamps)
+            return
+
         try:
             self.log("Attempting update")
-            new_levels = get_aithre(self._mac_)
-            self._levels_ = new_levels
+            previous_snapshot = self._snapshot_
+            new_levels, new_timestamps = get_characteristic_values(
+                self._mac_,
+                AITHRE_ADDR_TYPE,
+                Aithre.CHARACTERISTICS,
+                previous_snapshot.levels,
+                previous_snapshot.timestamps)
+            self._publish_snapshot_(new_levels, new_timestamps)
         except Exception as ex:
             # In case the read fails, we will want to
             # attempt to find the MAC of the Aithre again.
 
             self._mac_ = None
+            self._snapshot_ = SensorSnapshot(
+                None,
+                self._snapshot_.levels,
+                self._snapshot_.timestamps)
             self.warn(
                 "Exception while attempting to update the cached levels.update() E={}".format(ex))
 
@@ -377,10 +716,7 @@ class Aithre(BlueToothDevice):
         """
         Gets the battery level of the CO monitor device.
         """
-        if self._levels_ is not None:
-            return self._levels_[1]
-
-        return OFFLINE
+        return self._snapshot_.get_level(BATTERY_LEVEL_INDEX)
 
     def get_co_level(
         self
@@ -388,10 +724,7 @@ class Aithre(BlueToothDevice):
         """
         Gets the current carbon monoxide levels.
         """
-        if self._levels_ is not None:
-            return self._levels_[0]
-
-        return OFFLINE
+        return self._snapshot_.get_level(CO_LEVEL_INDEX)
 
 
 def update_aithre_sensor():
@@ -430,6 +763,95 @@ def update_illyrian_sensor():
         AithreManager.SPO2_SENSOR.update()
 
 
+def apply_sensor_snapshot(
+    sensor: BlueToothDevice,
+    sensor_class,
+    snapshot: SensorSnapshot
+):
+    """
+    Applies a snapshot that was collected by the BlueTooth worker process
+    to the given sensor, creating the sensor if needed.
+    The sensor does not use BlueTooth until it is updated.
+
+    Returns: The sensor that holds the snapshot, None if the worker has no sensor.
+    """
+    if snapshot is None:
+        return None
+
+    if sensor is None:
+        sensor = sensor_class()
+
+    sensor.set_snapshot(snapshot)
+
+    return sensor
+
+
+def update_all_sensors():
+    """
+    Updates each of the BlueTooth devices in turn.
+    """
+    print("Updating Aithre sensors")
+
+    # Global singleton for all to
+    # get to the Aithre
+    update_aithre_sensor()
+    update_illyrian_sensor()
+
+
+def get_alarm_thresholds(
+    settings: dict
+):
+    """
+    Returns the alarm thresholds described by the settings.
+    """
+    return [
+        AlarmThreshold(
+            CO_ALARM_NAME,
+            settings['co_alarm_level'],
+            settings['co_alarm_clear_level'],
+            True),
+        AlarmThreshold(
+            SPO2_ALARM_NAME,
+            settings['spo2_alarm_level'],
+            settings['spo2_alarm_clear_level'],
+            False)
+    ]
+
+
+def force_characteristic_read(
+    name: str
+):
+    """
+    Makes the next update read the named Aithre characteristic,
+    even if it is not due under its refresh interval.
+    The Illyrian is scanned every update, so it never needs forcing.
+    """
+    for characteristic in Aithre.CHARACTERISTICS:
+        if characteristic.name == name:
+            characteristic.force_next_read()
+
+
+def request_confirmation_read(
+    name: str
+):
+    """
+    Asks for the sensors to be read again right away
+    so a crossed alarm threshold can be confirmed.
+    The watched reading is read even if it is not due.
+
+    Arguments:
+        name {string} -- The name of the reading that crossed its threshold.
+    """
+    ble_worker = AithreManager.BLE_WORKER
+
+    if USE_BLE_WORKER_PROCESS and ble_worker is not None:
+        # Any message wakes the worker for an immediate update.
+        ble_worker.send({'update_now': name})
+    else:
+        force_characteristic_read(name)
+        update_task.run_now()
+
+
 class AithreManager(object):
     """
     Singleton manager class to make sure that the sensor data
@@ -437,40 +859,363 @@ class AithreManager(object):
     """
     CO_SENSOR = None
     SPO2_SENSOR = None
+    BLE_WORKER = None
+    WORKER_SPANS = {}
+    # The capture running inside of the BlueTooth worker, None if there is none.
+    WORKER_PROFILE_STATUS = None
+    ALARMS = AlarmEngine(
+        get_alarm_thresholds(aithre_config.get_all()),
+        request_confirmation_read,
+        aithre_config.get('alarm_history_size'))
+
+    # When each alarm reading was last evaluated,
+    # so the same reading is never evaluated twice.
+    __last_evaluated__ = {}
+
+    # Numbers each capture sent to the worker, so a state the worker
+    # sent before it saw the latest capture does not replace its status.
+    __last_profile_request__ = 0
+    __handled_profile_request__ = 0
 
     @staticmethod
     def update_sensors():
         """
         Updates the sensors for all available BlueTooth devices.
         """
-        print("Updating Aithre sensors")
+        if USE_BLE_WORKER_PROCESS:
+            AithreManager.update_sensors_from_worker()
+        else:
+            AithreManager.update_sensors_directly()
+
+        AithreManager.evaluate_alarms()
+
+    @staticmethod
+    def evaluate_alarm(
+        name: str,
+        snapshot: SensorSnapshot,
+        index: int
+    ):
+        """
+        Passes a reading to the alarm engine if it is new.
+        """
+        if snapshot is None:
+            return
+
+        timestamp = snapshot.get_timestamp(index)
+
+        if timestamp is None or AithreManager.__last_evaluated__.get(name) == timestamp:
+            return
+
+        AithreManager.__last_evaluated__[name] = timestamp
+        AithreManager.ALARMS.evaluate(name, snapshot.get_level(index))
+
+    @staticmethod
+    def evaluate_alarms():
+        """
+        Checks any new readings against the alarm thresholds.
+        """
+        AithreManager.evaluate_alarm(
+            CO_ALARM_NAME,
+            AithreManager.get_co_snapshot(),
+            CO_LEVEL_INDEX)
+        AithreManager.evaluate_alarm(
+            SPO2_ALARM_NAME,
+            AithreManager.get_spo2_snapshot(),
+            SPO2_LEVEL_INDEX)
+
+    @staticmethod
+    def update_sensors_directly():
+        """
+        Updates the sensors by talking to the BlueTooth devices from this process.
+        """
+        aithre_profiler.run_profiled(
+            aithre_profiler.CYCLES,
+            update_all_sensors)
+
+    @staticmethod
+    def start_profile_capture(
+        target: str,
+        count: int
+    ):
+        """
+        Profiles the next update cycles or HTTP requests.
+        When the BlueTooth worker process is in use the cycles
+        are profiled inside of the worker, and the report is
+        sent back once it is finished.
+
+        Arguments:
+            target {string} -- What to profile, aithre_profiler.CYCLES or aithre_profiler.REQUESTS.
+            count {int} -- How many to profile.
+        Returns: {bool} -- True if the capture was started.
+        """
+        if target not in aithre_profiler.TARGETS or count < 1:
+            return False
+
+        ble_worker = AithreManager.BLE_WORKER
+
+        if target == aithre_profiler.CYCLES \
+                and USE_BLE_WORKER_PROCESS \
+                and ble_worker is not None:
+            AithreManager.__last_profile_request__ += 1
+            request = AithreManager.__last_profile_request__
+
+            if not ble_worker.send({'profile': {'target': target, 'count': count, 'request': request}}):
+                return False
+
+            AithreManager.WORKER_PROFILE_STATUS = {
+                "target": target,
+                "remaining": count,
+                "request": request
+            }
+
+            return True
+
+        return aithre_profiler.start_capture(target, count)
+
+    @staticmethod
+    def get_profile_status():
+        """
+        Returns the state of the profile capture, including
+        one running inside of the BlueTooth worker.
+        """
+        status = aithre_profiler.get_status()
+        worker_status = AithreManager.WORKER_PROFILE_STATUS
+
+        if status["target"] is None \
+                and USE_BLE_WORKER_PROCESS \
+                and worker_status is not None:
+            status["target"] = worker_status["target"]
+            status["remaining"] = worker_status["remaining"]
+
+        return status
+
+    @staticmethod
+    def get_span_stats():
+        """
+        Returns the timing spans from this process,
+        and from the BlueTooth worker if it is in use.
+        """
+        return {
+            "main": aithre_profiler.get_span_stats(),
+            "worker": AithreManager.WORKER_SPANS
+        }
+
+    @staticmethod
+    def get_co_snapshot():
+        """
+        Returns the latest snapshot from the carbon monoxide sensor,
+        None if there is no sensor.
+        """
+        # Load the sensor once as the update thread may replace it.
+        co_sensor = AithreManager.CO_SENSOR
+
+        return co_sensor.get_snapshot() if co_sensor is not None else None
+
+    @staticmethod
+    def get_spo2_snapshot():
+        """
+        Returns the latest snapshot from the blood oxygen sensor,
+        None if there is no sensor.
+        """
+        spo2_sensor = AithreManager.SPO2_SENSOR
+
+        return spo2_sensor.get_snapshot() if spo2_sensor is not None else None
+
+    @staticmethod
+    def get_sensor_snapshots():
+        """
+        Returns the snapshots of the sensors so they may be sent to another process.
+        """
+        return {
+            CO_ALARM_NAME: AithreManager.get_co_snapshot(),
+            SPO2_ALARM_NAME: AithreManager.get_spo2_snapshot()
+        }
+
+    @staticmethod
+    def get_worker_state():
+        """
+        Returns what the BlueTooth worker process sends back after each update.
+        """
+        return {
+            "snapshots": AithreManager.get_sensor_snapshots(),
+            "spans": aithre_profiler.get_span_stats(),
+            "profile_status": dict(
+                aithre_profiler.get_status(),
+                request=AithreManager.__handled_profile_request__),
+            "profile_report": aithre_profiler.take_report()
+        }
+
+    @staticmethod
+    def apply_worker_profile_status(
+        profile_status: dict
+    ):
+        """
+        Updates the status of the capture sent to the worker
+        from the status the worker reported.
+        """
+        pending_status = AithreManager.WORKER_PROFILE_STATUS
+
+        if pending_status is None \
+                or profile_status["request"] < pending_status["request"]:
+            return
+
+        if profile_status["target"] is None:
+            AithreManager.WORKER_PROFILE_STATUS = None
+        else:
+            AithreManager.WORKER_PROFILE_STATUS = profile_status
+
+    @staticmethod
+    def update_sensors_from_worker():
+        """
+        Collects the latest sensor states from the BlueTooth worker process,
+        starting or restarting the worker as needed.
+        """
+        if AithreManager.BLE_WORKER is None:
+            AithreManager.BLE_WORKER = BleWorker(
+                "BleWorker",
+                get_update_interval,
+                AithreManager.update_sensors_directly,
+                AithreManager.get_worker_state,
+                WORKER_HANG_TIMEOUT,
+                message_callback=handle_worker_message,
+                startup_message_callback=get_worker_startup_message)
+            AithreManager.BLE_WORKER.start()
 
-        # Global singleton for all to
-        # get to the Aithre
-        update_aithre_sensor()
-        update_illyrian_sensor()
+        worker_state = AithreManager.BLE_WORKER.service()
+
+        if worker_state is None:
+            return
+
+        snapshots = worker_state["snapshots"]
+        AithreManager.WORKER_SPANS = worker_state["spans"]
+
+        if worker_state["profile_report"] is not None:
+            aithre_profiler.set_report(worker_state["profile_report"])
+
+        AithreManager.apply_worker_profile_status(worker_state["profile_status"])
+
+        AithreManager.CO_SENSOR = apply_sensor_snapshot(
+            AithreManager.CO_SENSOR,
+            Aithre,
+            snapshots[CO_ALARM_NAME])
+        AithreManager.SPO2_SENSOR = apply_sensor_snapshot(
+            AithreManager.SPO2_SENSOR,
+            Illyrian,
+            snapshots[SPO2_ALARM_NAME])
+
+
+def get_update_interval():
+    """
+    Returns how often the sensors are updated.
+    """
+    return SCAN_PERIOD
+
+
+def get_task_interval():
+    """
+    Returns how often the update task needs to run in this process.
+    """
+    return WORKER_SERVICE_INTERVAL if USE_BLE_WORKER_PROCESS else SCAN_PERIOD
+
+
+def get_worker_startup_message():
+    """
+    Returns the message that brings a new BlueTooth worker up to date
+    with any settings changed since the configuration file was read.
+    """
+    return {'config': aithre_config.get_all()}
+
+
+def handle_worker_message(
+    message: dict
+):
+    """
+    Handles a message sent from the main process to the BlueTooth worker.
+    Every message, such as a request for an immediate update,
+    also wakes the worker for its next update.
+    """
+    if 'config' in message:
+        aithre_config.update(message['config'])
+
+    if 'update_now' in message:
+        force_characteristic_read(message['update_now'])
+
+    if 'profile' in message:
+        aithre_profiler.start_capture(
+            message['profile']['target'],
+            message['profile']['count'])
+        AithreManager.__handled_profile_request__ = message['profile']['request']
+
+
+def apply_config(
+    settings: dict
+):
+    """
+    Applies changed settings to the running service.
+    """
+    global SCAN_PERIOD, SCAN_WINDOW, WORKER_SERVICE_INTERVAL, WORKER_HANG_PERIODS, WORKER_HANG_TIMEOUT
+    global CONNECT_BUDGET_FRACTION, DISCOVERY_BUDGET_FRACTION, READ_BUDGET_FRACTION
+    global DISCONNECT_BUDGET_FRACTION, SCAN_BUDGET_FRACTION
+    global CO_REFRESH_INTERVAL, BATTERY_REFRESH_INTERVAL
+
+    SCAN_PERIOD = settings['scan_period']
+    SCAN_WINDOW = settings['scan_window']
+    WORKER_SERVICE_INTERVAL = settings['worker_service_interval']
+    WORKER_HANG_PERIODS = settings['worker_hang_periods']
+    WORKER_HANG_TIMEOUT = SCAN_PERIOD * WORKER_HANG_PERIODS
+    CONNECT_BUDGET_FRACTION = settings['connect_budget_fraction']
+    DISCOVERY_BUDGET_FRACTION = settings['discovery_budget_fraction']
+    READ_BUDGET_FRACTION = settings['read_budget_fraction']
+    DISCONNECT_BUDGET_FRACTION = settings['disconnect_budget_fraction']
+    SCAN_BUDGET_FRACTION = settings['scan_budget_fraction']
+    CO_REFRESH_INTERVAL = settings['co_refresh_interval']
+    BATTERY_REFRESH_INTERVAL = settings['battery_refresh_interval']
+
+    # A characteristic without a setting keeps the interval it was declared with.
+    for characteristic in Aithre.CHARACTERISTICS:
+        characteristic.refresh_interval = settings.get(
+            get_refresh_interval_key(characteristic),
+            characteristic.refresh_interval)
+
+    update_task.set_interval(get_task_interval())
+
+    for threshold in get_alarm_thresholds(settings):
+        AithreManager.ALARMS.set_threshold(threshold)
+
+    AithreManager.ALARMS.set_max_events(settings['alarm_history_size'])
+
+    ble_worker = AithreManager.BLE_WORKER
+
+    if ble_worker is not None:
+        ble_worker.set_hang_timeout(WORKER_HANG_TIMEOUT)
+        ble_worker.send({'config': settings})
 
 
 update_task = AithreTask(
     "UpdateAithre",
-    SCAN_PERIOD,
+    get_task_interval(),
     AithreManager.update_sensors,
     None,
-    True)
+    IS_MAIN_PROCESS)
+
+aithre_config.add_listener(apply_config)
 
 if __name__ == '__main__':
     while True:
         try:
-            if AithreManager.CO_SENSOR is not None:
+            co_snapshot = AithreManager.get_co_snapshot()
+            spo2_snapshot = AithreManager.get_spo2_snapshot()
+
+            if co_snapshot is not None:
                 print("CO:{}PPM BAT:{}%".format(
-                    AithreManager.CO_SENSOR.get_co_level(),
-                    AithreManager.CO_SENSOR.get_battery()))
+                    co_snapshot.get_level(CO_LEVEL_INDEX),
+                    co_snapshot.get_level(BATTERY_LEVEL_INDEX)))
 
-            if AithreManager.SPO2_SENSOR is not None:
+            if spo2_snapshot is not None:
                 print("SPO2:{}%, {}BPM, SIGNAL:{}".format(
-                    AithreManager.SPO2_SENSOR.get_spo2_level(),
-                    AithreManager.SPO2_SENSOR.get_heartrate(),
-                    AithreManager.SPO2_SENSOR.get_signal_strength()))
+                    spo2_snapshot.get_level(SPO2_LEVEL_INDEX),
+                    spo2_snapshot.get_level(HEARTRATE_INDEX),
+                    spo2_snapshot.get_level(SIGNAL_STRENGTH_INDEX)))
         except:
             print("Exception in debug loop")
 
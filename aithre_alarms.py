@@ -0,0 +1,258 @@
+"""
+Module to detect hazardous readings and queue the resulting alarms.
+
+Thresholds use hysteresis so a reading hovering around the
+trigger level does not flood clients with alarms. A reading
+that crosses a threshold is only reported once a second,
+out-of-cycle, reading confirms it.
+"""
+
+import collections
+import datetime
+import threading
+
+NORMAL = "NORMAL"
+PENDING = "PENDING"
+ACTIVE = "ACTIVE"
+
+RAISED = "RAISED"
+CLEARED = "CLEARED"
+
+
+class AlarmThreshold(object):
+    """
+    The levels at which a reading raises and clears an alarm.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trigger_level: float,
+        clear_level: float,
+        is_high_alarm: bool
+    ):
+        """
+        Creates a new threshold.
+
+        Arguments:
+            name {string} -- The name of the reading being watched.
+            trigger_level {float} -- The level at which the alarm is raised.
+            clear_level {float} -- The level the reading must return past to clear the alarm.
+            is_high_alarm {bool} -- True if the alarm is for readings above the trigger, False for below.
+        """
+        self.name = name
+        self.trigger_level = trigger_level
+        self.clear_level = clear_level
+        self.is_high_alarm = is_high_alarm
+
+    def is_triggered(
+        self,
+        value: float
+    ):
+        """
+        Is the reading past the trigger level?
+        """
+        if self.is_high_alarm:
+            return value >= self.trigger_level
+
+        return value <= self.trigger_level
+
+    def is_cleared(
+        self,
+        value: float
+    ):
+        """
+        Has the reading returned past the clear level?
+        """
+        if self.is_high_alarm:
+            return value < self.clear_level
+
+        return value > self.clear_level
+
+
+class AlarmEvent(object):
+    """
+    Immutable record of an alarm being raised or cleared.
+    """
+
+    __slots__ = ('event_id', 'name', 'state', 'value', 'timestamp')
+
+    def __init__(
+        self,
+        event_id: int,
+        name: str,
+        state: str,
+        value: float
+    ):
+        object.__setattr__(self, 'event_id', event_id)
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'state', state)
+        object.__setattr__(self, 'value', value)
+        object.__setattr__(self, 'timestamp', datetime.datetime.utcnow())
+
+    def __setattr__(
+        self,
+        name,
+        value
+    ):
+        raise AttributeError("AlarmEvent is immutable")
+
+    def to_dict(
+        self
+    ):
+        """
+        Returns the event in a form that may be sent as JSON.
+        """
+        return {
+            "id": self.event_id,
+            "name": self.name,
+            "state": self.state,
+            "value": self.value,
+            "timestamp": self.timestamp.isoformat() + "Z"
+        }
+
+
+class AlarmEngine(object):
+    """
+    Evaluates each new reading against its threshold,
+    and keeps a bounded queue of the confirmed alarm events.
+    """
+
+    def evaluate(
+        self,
+        name: str,
+        value
+    ):
+        """
+        Evaluates a new reading.
+
+        A reading that crosses the trigger level asks for a confirmation
+        read. The alarm is only raised if the next reading is still past
+        the trigger level.
+
+        Arguments:
+            name {string} -- The name of the reading.
+            value -- The reading. Anything that is not a number is ignored.
+        """
+        threshold = self.__thresholds__.get(name)
+
+        if threshold is None \
+                or isinstance(value, bool) \
+                or not isinstance(value, (int, float)):
+            return
+
+        request_confirmation = False
+
+        with self.__condition__:
+            state = self.__states__.get(name, NORMAL)
+
+            if state == NORMAL:
+                if threshold.is_triggered(value):
+                    self.__states__[name] = PENDING
+                    request_confirmation = True
+            elif state == PENDING:
+                if threshold.is_triggered(value):
+                    self.__states__[name] = ACTIVE
+                    self.__publish__(name, RAISED, value)
+                else:
+                    self.__states__[name] = NORMAL
+            elif threshold.is_cleared(value):
+                self.__states__[name] = NORMAL
+                self.__publish__(name, CLEARED, value)
+
+        if request_confirmation and self.__confirmation_callback__ is not None:
+            self.__confirmation_callback__(name)
+
+    def __publish__(
+        self,
+        name: str,
+        state: str,
+        value
+    ):
+        # Must be called while holding the condition.
+        self.__last_event_id__ += 1
+        self.__events__.append(
+            AlarmEvent(self.__last_event_id__, name, state, value))
+        self.__condition__.notify_all()
+
+    def get_active_alarms(
+        self
+    ):
+        """
+        Returns the names of the readings that currently have an alarm raised.
+        """
+        with self.__condition__:
+            return [name for name, state in self.__states__.items() if state == ACTIVE]
+
+    def get_events(
+        self,
+        since_id: int = 0,
+        timeout: float = 0.0
+    ):
+        """
+        Returns the events newer than the given id.
+        If there are none, waits up to the timeout for one to arrive.
+
+        Event ids start again from 1 when the service restarts, so an id
+        newer than the latest event is from before a restart. Every event
+        still kept is returned for it, without waiting.
+
+        Arguments:
+            since_id {int} -- The id of the last event the caller has seen.
+            timeout {float} -- The number of seconds to wait for a new event.
+        Returns: {(list, int)} -- The new events, and the id of the latest event.
+        """
+        with self.__condition__:
+            if since_id > self.__last_event_id__:
+                since_id = 0
+
+            self.__condition__.wait_for(
+                lambda: self.__last_event_id__ > since_id,
+                timeout)
+
+            events = [event for event in self.__events__ if event.event_id > since_id]
+
+            return events, self.__last_event_id__
+
+    def set_threshold(
+        self,
+        threshold: AlarmThreshold
+    ):
+        """
+        Adds or replaces the threshold for a reading.
+        """
+        with self.__condition__:
+            self.__thresholds__[threshold.name] = threshold
+
+    def set_max_events(
+        self,
+        max_events: int
+    ):
+        """
+        Changes how many events are kept for clients.
+        """
+        with self.__condition__:
+            self.__events__ = collections.deque(
+                self.__events__,
+                maxlen=int(max_events))
+
+    def __init__(
+        self,
+        thresholds: list,
+        confirmation_callback,
+        max_events: int
+    ):
+        """
+        Creates a new alarm engine.
+
+        Arguments:
+            thresholds {list} -- The AlarmThreshold for each reading to watch.
+            confirmation_callback {callable} -- Called with the name of the reading to schedule an immediate read when its threshold is crossed.
+            max_events {int} -- The number of events to keep for clients.
+        """
+        self.__thresholds__ = {threshold.name: threshold for threshold in thresholds}
+        self.__confirmation_callback__ = confirmation_callback
+        self.__states__ = {}
+        self.__events__ = collections.deque(maxlen=int(max_events))
+        self.__last_event_id__ = 0
+        self.__condition__ = threading.Condition()
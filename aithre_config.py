@@ -0,0 +1,257 @@
+"""
+Module to hold the performance settings that may be tuned at runtime.
+
+Settings are loaded from an optional JSON file, may be changed
+through the REST service, and are applied live by the listeners.
+"""
+
+import json
+import math
+import os
+import threading
+
+CONFIG_FILE = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    'aithre_config.json')
+
+# Each setting has a default, a minimum, a maximum, and the type of value it must be.
+SETTINGS = {
+    # How often the sensors are updated, in seconds
+    'scan_period': (10, 1, 600, float),
+    # How long to listen for devices during a scan, in seconds
+    'scan_window': (2, 0.5, 30, float),
+    # How often the main process collects readings from the BlueTooth worker, in seconds
+    'worker_service_interval': (1, 0.1, 60, float),
+    # How many scan periods the BlueTooth worker may go without reporting before it is restarted
+    'worker_hang_periods': (3, 2, 100, int),
+    # The portion of the scan period each BlueTooth operation may use.
+    # A bluepy connect on a Raspberry Pi commonly takes 0.5 to 1.5 seconds,
+    # so connecting has the largest share: 2 seconds of the default period.
+    'connect_budget_fraction': (0.2, 0.01, 1.0, float),
+    'discovery_budget_fraction': (0.06, 0.01, 1.0, float),
+    'read_budget_fraction': (0.04, 0.01, 1.0, float),
+    'disconnect_budget_fraction': (0.02, 0.01, 1.0, float),
+    'scan_budget_fraction': (0.18, 0.01, 1.0, float),
+    # The minimum number of seconds between reads of each characteristic.
+    # A characteristic is matched by "<name>_refresh_interval".
+    'co_refresh_interval': (0, 0, 3600, float),
+    'battery_refresh_interval': (300, 0, 86400, float),
+    # The CO level, in PPM, that raises an alarm, and the level it must fall below to clear
+    'co_alarm_level': (50, 1, 255, float),
+    'co_alarm_clear_level': (35, 0, 255, float),
+    # The SpO2 percentage that raises an alarm, and the level it must rise above to clear
+    'spo2_alarm_level': (90, 50, 100, float),
+    'spo2_alarm_clear_level': (92, 50, 100, float),
+    # The number of alarm events kept for clients
+    'alarm_history_size': (100, 1, 10000, int),
+    # The longest a client may wait for a new alarm event, in seconds
+    'alarm_max_wait': (30, 0, 300, float),
+    # The port the REST service listens on. Applies after a restart.
+    'rest_port': (8081, 1, 65535, int),
+    # Run the BlueTooth work in a dedicated worker process. Applies after a restart.
+    'use_ble_worker_process': (False, False, True, bool)
+}
+
+# Allows for rounding when the budget fractions add up to exactly 1
+BUDGET_TOLERANCE = 1e-9
+
+# The worst case update cycle scans for both the Aithre and the
+# Illyrian, and reads each of the Aithre's characteristics.
+# The sensors do not scan when they are created, so the first
+# cycle is no worse.
+WORST_CASE_SCANS = 2
+WORST_CASE_READS = 2
+
+__lock__ = threading.Lock()
+__values__ = {key: setting[0] for key, setting in SETTINGS.items()}
+__listeners__ = []
+
+
+def get(
+    key: str
+):
+    """
+    Returns the current value of a setting.
+    """
+    return __values__[key]
+
+
+def get_all():
+    """
+    Returns a copy of all of the current settings.
+    """
+    with __lock__:
+        return dict(__values__)
+
+
+def add_listener(
+    callback
+):
+    """
+    Registers a callback that is invoked, with a copy of all
+    of the settings, whenever the settings change.
+    """
+    __listeners__.append(callback)
+
+
+def get_worst_case_cycle_fraction(
+    settings: dict
+):
+    """
+    Returns the portion of the scan period that the
+    slowest possible update cycle may use.
+    """
+    read_fraction = settings['connect_budget_fraction'] \
+        + settings['discovery_budget_fraction'] \
+        + settings['read_budget_fraction'] \
+        + settings['disconnect_budget_fraction']
+
+    return (WORST_CASE_SCANS * settings['scan_budget_fraction']) \
+        + (WORST_CASE_READS * read_fraction)
+
+
+def validate_related(
+    settings: dict
+):
+    """
+    Checks the settings that depend on each other.
+    Arguments:
+        settings {dict} -- All of the settings, with any changes merged in.
+    Returns: {list} -- A description of each problem, empty if the settings are valid.
+    """
+    errors = []
+
+    worst_case_fraction = get_worst_case_cycle_fraction(settings)
+
+    if worst_case_fraction > 1.0 + BUDGET_TOLERANCE:
+        errors.append(
+            'The budget fractions allow a cycle of {:.2f} scan periods, which must not be more than 1'.format(
+                worst_case_fraction))
+
+    # The clear level must be on the safe side of the trigger level,
+    # otherwise a steady reading raises and clears the alarm every cycle.
+    if settings['co_alarm_clear_level'] >= settings['co_alarm_level']:
+        errors.append('co_alarm_clear_level must be below co_alarm_level')
+
+    if settings['spo2_alarm_clear_level'] <= settings['spo2_alarm_level']:
+        errors.append('spo2_alarm_clear_level must be above spo2_alarm_level')
+
+    return errors
+
+
+def validate(
+    changes: dict
+):
+    """
+    Checks the given changes against the known settings.
+    Arguments:
+        changes {dict} -- The settings to change, and their new values.
+    Returns: {list} -- A description of each problem, empty if the changes are valid.
+    """
+    if not isinstance(changes, dict):
+        return ['Expected a JSON object of settings']
+
+    errors = []
+
+    for key, value in changes.items():
+        if key not in SETTINGS:
+            errors.append('{} is not a known setting'.format(key))
+            continue
+
+        default, minimum, maximum, value_type = SETTINGS[key]
+
+        if value_type is bool:
+            if not isinstance(value, bool):
+                errors.append('{} must be true or false'.format(key))
+
+            continue
+
+        if isinstance(value, bool) \
+                or not isinstance(value, (int, float)) \
+                or not math.isfinite(value):
+            errors.append('{} must be a finite number'.format(key))
+            continue
+
+        # A whole number sent as 8081.0 is still accepted.
+        if value_type is int and value != int(value):
+            errors.append('{} must be a whole number'.format(key))
+            continue
+
+        if value < minimum or value > maximum:
+            errors.append('{} must be between {} and {}'.format(
+                key,
+                minimum,
+                maximum))
+
+    if any(errors):
+        return errors
+
+    with __lock__:
+        settings = dict(__values__)
+
+    settings.update(changes)
+
+    return validate_related(settings)
+
+
+def update(
+    changes: dict
+):
+    """
+    Applies the given changes if they are all valid,
+    then notifies the listeners.
+    Arguments:
+        changes {dict} -- The settings to change, and their new values.
+    Returns: {list} -- A description of each problem, empty if the changes were applied.
+    """
+    errors = validate(changes)
+
+    if any(errors):
+        return errors
+
+    changes = {key: SETTINGS[key][3](value) for key, value in changes.items()}
+
+    with __lock__:
+        __values__.update(changes)
+        settings = dict(__values__)
+
+    for callback in __listeners__:
+        try:
+            callback(settings)
+        except Exception as e:
+            print("EX(config listener):{}".format(e))
+
+    return errors
+
+
+def load(
+    config_file: str = None
+):
+    """
+    Loads the settings from the configuration file, if there is one.
+    Returns: {list} -- A description of each problem, empty if the file was applied.
+    """
+    config_file = config_file or CONFIG_FILE
+
+    if not os.path.exists(config_file):
+        return []
+
+    try:
+        with open(config_file) as file:
+            changes = json.load(file)
+    except Exception as e:
+        return ['Unable to read {}: {}'.format(config_file, e)]
+
+    return update(changes)
+
+
+def save(
+    config_file: str = None
+):
+    """
+    Writes the current settings to the configuration file.
+    """
+    config_file = config_file or CONFIG_FILE
+
+    with open(config_file, 'w') as file:
+        json.dump(get_all(), file, indent=4, sort_keys=True)
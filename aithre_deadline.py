@@ -0,0 +1,71 @@
+"""
+Module to run blocking operations with a deadline.
+"""
+
+import threading
+
+import aithre_profiler
+
+
+class DeadlineExceededError(Exception):
+    """
+    Raised when an operation does not finish within its budget.
+    """
+    pass
+
+
+def run_with_deadline(
+    operation_name: str,
+    budget: float,
+    operation,
+    cancel_callback=None
+):
+    """
+    Runs the operation on a helper thread and waits at most
+    the budget for it to finish.
+
+    If the budget expires then the cancel callback is invoked
+    so the blocked operation can be torn down cleanly.
+
+    Arguments:
+        operation_name {string} -- The name of the operation, used in errors.
+        budget {float} -- The number of seconds the operation may take.
+        operation {callable} -- The blocking operation to run.
+        cancel_callback {callable} -- Called to abort the operation if the budget expires.
+    Returns: The result of the operation.
+    Raises: DeadlineExceededError if the budget expires. Any exception raised by the operation.
+    """
+    outcome = {}
+
+    # The helper thread is not seen by the profiler of this one.
+    operation = aithre_profiler.bind_to_capture(operation)
+
+    def __run_operation__():
+        try:
+            outcome['result'] = operation()
+        except Exception as e:
+            outcome['error'] = e
+
+    worker = threading.Thread(
+        name=operation_name,
+        target=__run_operation__,
+        daemon=True)
+    worker.start()
+    worker.join(budget)
+
+    if worker.is_alive():
+        if cancel_callback is not None:
+            try:
+                cancel_callback()
+            except Exception as e:
+                print("EX({}) while cancelling:{}".format(operation_name, e))
+
+        raise DeadlineExceededError(
+            "{} did not finish within {:.2f} seconds".format(
+                operation_name,
+                budget))
+
+    if 'error' in outcome:
+        raise outcome['error']
+
+    return outcome.get('result')
@@ -11,18 +11,26 @@ import shutil
 import socket
 import sys
 import urllib
+import urllib.parse
 
 from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 
 import aithre
+import aithre_config
+import aithre_profiler
 
-RESTFUL_HOST_PORT = 8081
+RESTFUL_HOST_PORT = aithre_config.get('rest_port')
 
 # EXAMPLES
 # Invoke-WebRequest -Uri "http://localhost:8081/aithre" -Method GET -ContentType "application/json"
 # Invoke-WebRequest -Uri "http://localhost:8081/illyrian" -Method GET -ContentType "application/json"
 #
 # curl -X GET http://localhost:8081/aithre
+# curl -X PUT -d '{"scan_period": 5}' http://localhost:8081/config
+# curl -X GET "http://localhost:8081/alarms?since=0&wait=30"
+# curl -X PUT -d '{"target": "cycles", "count": 3}' http://localhost:8081/debug/profile
+# curl -X GET http://localhost:8081/debug/profile/report -o profile.txt
 
 ERROR_JSON_KEY = 'error'
 
@@ -33,6 +41,13 @@ SPO2_LEVEL_KEY = "spo2"
 PULSE_KEY = "heartrate"
 SIGNAL_STRENGTH_KEY = "signal"
 
+ALARMS_KEY = "alarms"
+ACTIVE_ALARMS_KEY = "active"
+LAST_ALARM_ID_KEY = "last_id"
+
+PROFILE_TARGET_KEY = "target"
+PROFILE_COUNT_KEY = "count"
+
 
 def get_aithre(
     handler
@@ -43,9 +58,12 @@ def get_aithre(
     """
     co_response = {ERROR_JSON_KEY: 'Aithre CO sensor not detected'}
 
-    if aithre.AithreManager.CO_SENSOR is not None:
-        co_response = {CO_LEVEL_KEY: aithre.AithreManager.CO_SENSOR.get_co_level(),
-                       BATTERY_LEVEL_KEY: aithre.AithreManager.CO_SENSOR.get_battery()}
+    # A single snapshot keeps the values from the same update cycle.
+    co_snapshot = aithre.AithreManager.get_co_snapshot()
+
+    if co_snapshot is not None:
+        co_response = {CO_LEVEL_KEY: co_snapshot.get_level(aithre.CO_LEVEL_INDEX),
+                       BATTERY_LEVEL_KEY: co_snapshot.get_level(aithre.BATTERY_LEVEL_INDEX)}
     return json.dumps(
         co_response,
         indent=4,
@@ -61,10 +79,12 @@ def get_illyrian(
     """
     spo2_response = {ERROR_JSON_KEY: 'Illyrian SPO2 sensor not detected'}
 
-    if aithre.AithreManager.SPO2_SENSOR is not None:
-        spo2_response = {SPO2_LEVEL_KEY: aithre.AithreManager.SPO2_SENSOR.get_spo2_level(),
-                         PULSE_KEY: aithre.AithreManager.SPO2_SENSOR.get_heartrate(),
-                         SIGNAL_STRENGTH_KEY: aithre.AithreManager.SPO2_SENSOR.get_signal_strength()}
+    spo2_snapshot = aithre.AithreManager.get_spo2_snapshot()
+
+    if spo2_snapshot is not None:
+        spo2_response = {SPO2_LEVEL_KEY: spo2_snapshot.get_level(aithre.SPO2_LEVEL_INDEX),
+                         PULSE_KEY: spo2_snapshot.get_level(aithre.HEARTRATE_INDEX),
+                         SIGNAL_STRENGTH_KEY: spo2_snapshot.get_level(aithre.SIGNAL_STRENGTH_INDEX)}
 
     return json.dumps(
         spo2_response,
@@ -72,15 +92,173 @@ def get_illyrian(
         sort_keys=False)
 
 
+def get_query_number(
+    handler,
+    name: str,
+    default: float
+):
+    """
+    Returns a number from the query string of the request,
+    or the default if it is missing or not a number.
+    """
+    query = urllib.parse.urlparse(handler.path).query
+
+    try:
+        return float(urllib.parse.parse_qs(query)[name][0])
+    except:
+        return default
+
+
+def get_alarms(
+    handler
+):
+    """
+    Creates a response package with the alarm events newer than
+    the "since" id in the query. If there are none, the request
+    is held for up to "wait" seconds until one arrives.
+    """
+    since_id = int(get_query_number(handler, 'since', 0))
+    wait = min(
+        get_query_number(handler, 'wait', 0),
+        aithre_config.get('alarm_max_wait'))
+    wait = max(wait, 0)
+
+    events, last_id = aithre.AithreManager.ALARMS.get_events(since_id, wait)
+
+    return json.dumps(
+        {ALARMS_KEY: [event.to_dict() for event in events],
+         ACTIVE_ALARMS_KEY: aithre.AithreManager.ALARMS.get_active_alarms(),
+         LAST_ALARM_ID_KEY: last_id},
+        indent=4,
+        sort_keys=False)
+
+
+def get_config(
+    handler
+):
+    """
+    Creates a response package that gives the current performance settings.
+    """
+    return json.dumps(
+        aithre_config.get_all(),
+        indent=4,
+        sort_keys=True)
+
+
+def put_config(
+    handler
+):
+    """
+    Applies the performance settings in the payload to the running
+    service, saves them, and responds with the resulting settings.
+    Responds with a 400 if the payload is missing, unreadable, or invalid.
+    """
+    changes = handler.get_payload()
+
+    if changes is None:
+        errors = ['Expected a JSON object of settings']
+    elif changes == {}:
+        errors = ['No settings were given']
+    else:
+        errors = aithre_config.update(changes)
+
+    if any(errors):
+        return 400, json.dumps(
+            {ERROR_JSON_KEY: errors},
+            indent=4,
+            sort_keys=False)
+
+    try:
+        aithre_config.save()
+    except Exception as e:
+        print("Unable to save the config, e={}".format(e))
+
+    return get_config(handler)
+
+
+def get_debug_spans(
+    handler
+):
+    """
+    Creates a response package with the timing of each
+    stage of the BlueTooth operations.
+    """
+    return json.dumps(
+        aithre.AithreManager.get_span_stats(),
+        indent=4,
+        sort_keys=True)
+
+
+def get_debug_profile(
+    handler
+):
+    """
+    Creates a response package with the state of the profile capture.
+    """
+    return json.dumps(
+        aithre.AithreManager.get_profile_status(),
+        indent=4,
+        sort_keys=False)
+
+
+def put_debug_profile(
+    handler
+):
+    """
+    Starts profiling the next update cycles or HTTP requests
+    given by the target and count in the payload.
+    """
+    payload = handler.get_payload()
+
+    try:
+        target = payload[PROFILE_TARGET_KEY]
+        count = int(payload.get(PROFILE_COUNT_KEY, 1))
+    except:
+        target = None
+        count = 0
+
+    if not aithre.AithreManager.start_profile_capture(target, count):
+        return 400, json.dumps(
+            {ERROR_JSON_KEY: 'Expected a target of {} and a positive count'.format(
+                ' or '.join(aithre_profiler.TARGETS))},
+            indent=4,
+            sort_keys=False)
+
+    return get_debug_profile(handler)
+
+
+def get_debug_profile_report(
+    handler
+):
+    """
+    Returns the report from the last finished profile capture.
+    """
+    return aithre_profiler.get_report()
+
+
 class AithreHost(BaseHTTPRequestHandler):
     """
     Handles the HTTP response for status.
     """
 
     HERE = os.path.dirname(os.path.realpath(__file__))
+
+    # Routes marked 'profile': False are never profiled. Profiled requests
+    # run one at a time, so a long-poll would hold up every other request,
+    # and the debug routes would only show up in their own reports.
     ROUTES = {
         r'^/aithre': {'GET': get_aithre},
-        r'^/illyrian': {'GET': get_illyrian}
+        r'^/illyrian': {'GET': get_illyrian},
+        r'^/config': {'GET': get_config, 'PUT': put_config},
+        r'^/alarms': {'GET': get_alarms, 'profile': False},
+        r'^/debug/spans$': {'GET': get_debug_spans, 'profile': False},
+        r'^/debug/profile$': {'GET': get_debug_profile,
+                              'PUT': put_debug_profile,
+                              'profile': False},
+        r'^/debug/profile/report$': {'GET': get_debug_profile_report,
+                                     'media_type': 'text/plain',
+                                     'download_name': 'aithre_profile.txt',
+                                     'profile': False}
     }
 
     def do_HEAD(self):
@@ -99,13 +277,16 @@ class AithreHost(BaseHTTPRequestHandler):
         self.handle_method('DELETE')
 
     def get_payload(self):
+        """
+        Returns the JSON payload of the request, None if it is missing or unreadable.
+        """
         try:
-            payload_len = int(self.headers.getheader('content-length', 0))
+            payload_len = int(self.headers.get('content-length', 0))
             payload = self.rfile.read(payload_len)
             payload = json.loads(payload)
             return payload
         except:
-            return {}
+            return None
 
     def __handle_invalid_route__(self):
         """
@@ -113,7 +294,7 @@ class AithreHost(BaseHTTPRequestHandler):
         """
         self.send_response(404)
         self.end_headers()
-        self.wfile.write('Route not found\n')
+        self.wfile.write(b'Route not found\n')
 
     def __handle_file_request__(self, route, method):
         if method == 'GET':
@@ -132,31 +313,39 @@ class AithreHost(BaseHTTPRequestHandler):
             except:
                 self.send_response(404)
                 self.end_headers()
-                self.wfile.write('File not found\n')
+                self.wfile.write(b'File not found\n')
         else:
             self.send_response(405)
             self.end_headers()
-            self.wfile.write('Only GET is supported\n')
+            self.wfile.write(b'Only GET is supported\n')
 
     def __finish_get_put_delete_request__(self, route, method):
         if method in route:
             content = route[method](self)
+            # A route may return (status, content) to respond with something other than a 200.
+            status = 200
+            if isinstance(content, tuple):
+                status, content = content
             if content is not None:
-                self.send_response(200)
+                self.send_response(status)
                 if 'media_type' in route:
                     self.send_header(
                         'Content-type', route['media_type'])
+                if 'download_name' in route:
+                    self.send_header(
+                        'Content-Disposition',
+                        'attachment; filename="{}"'.format(route['download_name']))
                 self.end_headers()
                 if method != 'DELETE':
                     self.wfile.write(content.encode('utf-8'))
             else:
                 self.send_response(404)
                 self.end_headers()
-                self.wfile.write('Not found\n')
+                self.wfile.write(b'Not found\n')
         else:
             self.send_response(405)
             self.end_headers()
-            self.wfile.write(method + ' is not supported\n')
+            self.wfile.write((method + ' is not supported\n').encode('utf-8'))
 
     def __handle_request__(self, route, method):
         if method == 'HEAD':
@@ -174,8 +363,12 @@ class AithreHost(BaseHTTPRequestHandler):
         route = self.get_route()
         if route is None:
             self.__handle_invalid_route__()
-        else:
+        elif not route.get('profile', True):
             self.__handle_request__(route, method)
+        else:
+            aithre_profiler.run_profiled(
+                aithre_profiler.REQUESTS,
+                lambda: self.__handle_request__(route, method))
 
     def get_route(self):
         for path, route in AithreHost.ROUTES.items():
@@ -184,6 +377,14 @@ class AithreHost(BaseHTTPRequestHandler):
         return None
 
 
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    Handles each request on its own thread so a client
+    waiting on alarms does not hold up everyone else.
+    """
+    daemon_threads = True
+
+
 class AithreServer(object):
     """
     Class to handle running a REST endpoint to handle configuration.
@@ -225,7 +426,7 @@ class AithreServer(object):
         self.__port__ = RESTFUL_HOST_PORT
         self.__local_ip__ = self.get_server_ip()
         server_address = (self.__local_ip__, self.__port__)
-        self.__http__ = HTTPServer(server_address, AithreHost)
+        self.__http__ = ThreadedHTTPServer(server_address, AithreHost)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,348 @@
+"""
+Module to help diagnose performance on the aircraft.
+
+Timing spans are always on and cheap: they keep a count, total,
+and worst case for each named stage.
+
+A profile capture is started on demand, and records a CPU profile
+and an allocation snapshot over the next N update cycles or N
+HTTP requests. The result is kept as a text report.
+"""
+
+import contextlib
+import cProfile
+import datetime
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+
+CYCLES = "cycles"
+REQUESTS = "requests"
+TARGETS = [CYCLES, REQUESTS]
+
+# How many lines of each section to include in a report
+REPORT_FUNCTION_COUNT = 40
+REPORT_ALLOCATION_COUNT = 25
+
+__span_lock__ = threading.Lock()
+__spans__ = {}
+
+__capture_lock__ = threading.Lock()
+__capture__ = None
+__report__ = None
+
+# Only one profiler may be active at a time,
+# so profiled work is run one at a time.
+__profile_lock__ = threading.Lock()
+
+# The capture being recorded by each thread, so work the
+# thread hands to a helper thread can be added to it.
+__recording__ = threading.local()
+
+
+@contextlib.contextmanager
+def timing_span(
+    name: str
+):
+    """
+    Times the enclosed block and adds it to the stats for the named span.
+
+    Arguments:
+        name {string} -- The name of the stage being timed.
+    """
+    start_time = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start_time
+
+        with __span_lock__:
+            span = __spans__.get(name)
+
+            if span is None:
+                span = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+                __spans__[name] = span
+
+            span["count"] += 1
+            span["total"] += elapsed
+            span["max"] = max(span["max"], elapsed)
+            span["last"] = elapsed
+
+
+def get_span_stats():
+    """
+    Returns the stats for each span, with the times in seconds.
+    """
+    with __span_lock__:
+        stats = {}
+
+        for name, span in __spans__.items():
+            stats[name] = dict(span)
+            stats[name]["average"] = span["total"] / span["count"]
+
+        return stats
+
+
+def reset_span_stats():
+    """
+    Clears the stats for all of the spans.
+    """
+    with __span_lock__:
+        __spans__.clear()
+
+
+class ProfileCapture(object):
+    """
+    Collects a CPU profile and allocation snapshot over a number of runs.
+    """
+
+    def record(
+        self,
+        callback
+    ):
+        """
+        Runs the callback under the profiler.
+
+        Returns: The result of the callback.
+        """
+        profile = cProfile.Profile()
+
+        with __profile_lock__:
+            __recording__.capture = self
+            profile.enable()
+
+            try:
+                return callback()
+            finally:
+                profile.disable()
+                __recording__.capture = None
+                self.__add_stats__(profile)
+                self.remaining -= 1
+
+    def record_helper(
+        self,
+        callback
+    ):
+        """
+        Runs the callback under its own profiler and adds the result
+        to the capture. Used on the helper threads of a profiled run,
+        as a profiler only sees the thread that enabled it.
+
+        Returns: The result of the callback.
+        """
+        profile = cProfile.Profile()
+
+        try:
+            profile.enable()
+        except ValueError:
+            # From Python 3.12 there is a single profiler for every
+            # thread, and the run's profiler already sees this one.
+            return callback()
+
+        try:
+            return callback()
+        finally:
+            profile.disable()
+            self.__add_stats__(profile)
+
+    def __add_stats__(
+        self,
+        profile
+    ):
+        with self.__stats_lock__:
+            if self.__stats__ is None:
+                self.__stats__ = pstats.Stats(profile)
+            else:
+                self.__stats__.add(profile)
+
+    def cancel(
+        self
+    ):
+        """
+        Abandons the capture without a report,
+        and stops tracing allocations if it started the tracing.
+        """
+        if self.__started_tracing__ and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+        self.__started_tracing__ = False
+
+    def finish(
+        self
+    ):
+        """
+        Stops the capture and returns the text report.
+        """
+        allocations = []
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            allocations = snapshot.compare_to(self.__baseline__, 'lineno')
+
+            if self.__started_tracing__:
+                tracemalloc.stop()
+                self.__started_tracing__ = False
+
+        report = io.StringIO()
+        report.write("Profile of {} {}\n".format(self.count, self.target))
+        report.write("Started:  {}Z\n".format(self.started.isoformat()))
+        report.write("Finished: {}Z\n\n".format(
+            datetime.datetime.utcnow().isoformat()))
+
+        report.write("=== CPU (by cumulative time) ===\n")
+
+        with self.__stats_lock__:
+            if self.__stats__ is not None:
+                self.__stats__.stream = report
+                self.__stats__.sort_stats('cumulative').print_stats(
+                    REPORT_FUNCTION_COUNT)
+
+        report.write("=== Allocations (by size change) ===\n")
+
+        for allocation in allocations[:REPORT_ALLOCATION_COUNT]:
+            report.write("{}\n".format(allocation))
+
+        return report.getvalue()
+
+    def __init__(
+        self,
+        target: str,
+        count: int
+    ):
+        """
+        Starts a new capture.
+
+        Arguments:
+            target {string} -- What is being profiled, CYCLES or REQUESTS.
+            count {int} -- How many runs to profile.
+        """
+        self.target = target
+        self.count = count
+        self.remaining = count
+        self.started = datetime.datetime.utcnow()
+        self.__stats__ = None
+        self.__stats_lock__ = threading.Lock()
+        self.__started_tracing__ = not tracemalloc.is_tracing()
+
+        if self.__started_tracing__:
+            tracemalloc.start()
+
+        self.__baseline__ = tracemalloc.take_snapshot()
+
+
+def start_capture(
+    target: str,
+    count: int
+):
+    """
+    Starts profiling the next runs of the target.
+    Any capture already in progress is replaced.
+
+    Arguments:
+        target {string} -- What to profile, CYCLES or REQUESTS.
+        count {int} -- How many runs to profile.
+    Returns: {bool} -- True if the capture was started.
+    """
+    global __capture__
+
+    if target not in TARGETS or count < 1:
+        return False
+
+    with __capture_lock__:
+        # The capture being replaced never finishes, so it must
+        # stop its allocation tracing here or it stays on for good.
+        if __capture__ is not None:
+            __capture__.cancel()
+
+        __capture__ = ProfileCapture(target, int(count))
+
+    return True
+
+
+def run_profiled(
+    target: str,
+    callback
+):
+    """
+    Runs the callback, profiling it if a capture of the target is in progress.
+
+    Returns: The result of the callback.
+    """
+    global __capture__, __report__
+
+    capture = __capture__
+
+    if capture is None or capture.target != target:
+        return callback()
+
+    try:
+        return capture.record(callback)
+    finally:
+        with __capture_lock__:
+            if __capture__ is capture and capture.remaining <= 0:
+                __capture__ = None
+                __report__ = capture.finish()
+
+
+def bind_to_capture(
+    callback
+):
+    """
+    Returns the callback, made to be profiled as part of the capture
+    the calling thread is recording, if there is one.
+    Used for work the calling thread hands to a helper thread.
+    """
+    capture = getattr(__recording__, 'capture', None)
+
+    if capture is None:
+        return callback
+
+    return lambda: capture.record_helper(callback)
+
+
+def get_status():
+    """
+    Returns the state of the current capture, and if a report is ready.
+    """
+    capture = __capture__
+
+    return {
+        "target": capture.target if capture is not None else None,
+        "remaining": capture.remaining if capture is not None else 0,
+        "report_ready": __report__ is not None
+    }
+
+
+def get_report():
+    """
+    Returns the report from the last finished capture, None if there is none.
+    """
+    return __report__
+
+
+def set_report(
+    report: str
+):
+    """
+    Sets the report, such as one captured by another process.
+    """
+    global __report__
+
+    __report__ = report
+
+
+def take_report():
+    """
+    Returns the report from the last finished capture and clears it,
+    so it is only handed out once. None if there is none.
+    """
+    global __report__
+
+    with __capture_lock__:
+        report = __report__
+        __report__ = None
+
+    return report
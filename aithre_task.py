@@ -30,6 +30,27 @@ class AithreTask(object):
 
         return False
 
+    def run_now(
+        self
+    ):
+        """
+        Wakes the task so it runs again as soon as the current cycle finishes,
+        instead of waiting out the interval.
+        """
+        self.__run_requested__ = True
+        self.__wake_event__.set()
+
+    def set_interval(
+        self,
+        task_interval: float
+    ):
+        """
+        Changes how often the task runs.
+        A task that is waiting recomputes its wait from the new interval.
+        """
+        self.__task_interval__ = task_interval
+        self.__wake_event__.set()
+
     def __run_loop__(
         self
     ):
@@ -45,14 +66,23 @@ class AithreTask(object):
                     self.__logger__.info(error_mesage)
                 else:
                     print(error_mesage)
-            task_run_time = datetime.datetime.utcnow() - task_start_time
-            time_to_sleep = self.__task_interval__ - task_run_time.total_seconds()
 
-            if time_to_sleep > 0.0:
+            # The wait is recomputed each time the task is woken,
+            # so a changed interval applies to the current wait.
+            while not self.__run_requested__:
+                task_run_time = datetime.datetime.utcnow() - task_start_time
+                time_to_sleep = self.__task_interval__ - task_run_time.total_seconds()
+
+                if time_to_sleep <= 0.0:
+                    break
+
                 print("{}: Sleeping for {} seconds".format(
                     self.__task_name__,
                     time_to_sleep))
-                time.sleep(time_to_sleep)
+                self.__wake_event__.wait(time_to_sleep)
+                self.__wake_event__.clear()
+
+            self.__run_requested__ = False
 
     def __init__(
         self,
@@ -71,6 +101,8 @@ class AithreTask(object):
         self.__task_interval__ = task_interval
         self.__task_callback__ = task_callback
         self.__logger__ = logger
+        self.__wake_event__ = threading.Event()
+        self.__run_requested__ = False
         self.__thread__ = threading.Thread(
             target=self.__run_loop__
         )
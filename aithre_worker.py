@@ -0,0 +1,308 @@
+"""
+Module to run the BlueTooth I/O in a dedicated worker process.
+
+The worker owns the radio and streams the sensor states back to the
+main process over a pipe. The main process supervises the worker
+and restarts it when it stops reporting.
+"""
+
+import datetime
+import multiprocessing
+import os
+import signal
+from logging import Logger
+
+
+def __get_context__():
+    """
+    The worker is spawned as a fresh interpreter rather than forked.
+    The main process runs the REST server and update threads that
+    hold locks, and a fork taken while one of them is held would
+    leave the worker deadlocked on it.
+    """
+    return multiprocessing.get_context('spawn')
+
+
+def __worker_loop__(
+    connection,
+    interval_callback,
+    update_callback,
+    state_callback,
+    message_callback
+):
+    """
+    Runs inside of the worker process.
+    Handles any messages from the parent, performs an update,
+    sends the resulting state to the parent, then waits for the next cycle.
+    """
+    # Lead a new process group so the bluepy-helper processes started
+    # by the worker can be stopped along with it.
+    if hasattr(os, 'setsid'):
+        os.setsid()
+
+    while True:
+        cycle_start_time = datetime.datetime.utcnow()
+
+        try:
+            while connection.poll():
+                message = connection.recv()
+
+                if message_callback is not None:
+                    message_callback(message)
+
+            update_callback()
+            connection.send(state_callback())
+        except (BrokenPipeError, EOFError):
+            # The parent has gone away, so there is nobody to report to.
+            return
+        except Exception as e:
+            print("EX(BleWorker):{}".format(e))
+
+        cycle_run_time = datetime.datetime.utcnow() - cycle_start_time
+        time_to_sleep = interval_callback() - cycle_run_time.total_seconds()
+
+        # A message from the parent, such as a request
+        # for an immediate update, cuts the wait short.
+        if time_to_sleep > 0.0:
+            try:
+                connection.poll(time_to_sleep)
+            except (EOFError, OSError):
+                return
+
+
+class BleWorker(object):
+    """
+    Object to control and supervise a BlueTooth worker process.
+    """
+
+    def log(
+        self,
+        text: str
+    ):
+        """
+        Logs the given text if a logger is available.
+
+        Arguments:
+            text {string} -- The text to log
+        """
+
+        if self.__logger__ is not None:
+            self.__logger__.info(text)
+        else:
+            print("INFO:{}".format(text))
+
+    def start(
+        self
+    ):
+        """
+        Starts the worker process if it is not already running.
+        """
+        if self.is_alive():
+            return False
+
+        parent_connection, child_connection = self.__context__.Pipe()
+
+        self.__connection__ = parent_connection
+        self.__process__ = self.__context__.Process(
+            name=self.__worker_name__,
+            target=__worker_loop__,
+            args=(
+                child_connection,
+                self.__interval_callback__,
+                self.__update_callback__,
+                self.__state_callback__,
+                self.__message_callback__))
+        self.__process__.daemon = True
+        self.__process__.start()
+
+        # The child holds its own copy of this end.
+        child_connection.close()
+
+        self.__last_heard__ = datetime.datetime.utcnow()
+
+        self.log("{}: Started worker pid={}".format(
+            self.__worker_name__,
+            self.__process__.pid))
+
+        if self.__startup_message_callback__ is not None:
+            self.send(self.__startup_message_callback__())
+
+        return True
+
+    def __signal_worker__(
+        self,
+        signal_number: int
+    ):
+        """
+        Sends the signal to the worker and to every bluepy-helper it started.
+        """
+        try:
+            os.killpg(self.__process__.pid, signal_number)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            # Not on POSIX, or the worker has not made its group yet.
+            if signal_number == signal.SIGTERM:
+                self.__process__.terminate()
+            else:
+                os.kill(self.__process__.pid, signal_number)
+
+    def stop(
+        self
+    ):
+        """
+        Stops the worker process, and the bluepy-helper processes
+        it started, if it is running.
+        """
+        if self.__process__ is not None:
+            if self.__process__.is_alive():
+                self.__signal_worker__(signal.SIGTERM)
+                self.__process__.join(1.0)
+
+            # A worker stuck on a helper may ignore the request,
+            # and the helpers outlive the worker on their own.
+            if hasattr(signal, 'SIGKILL'):
+                try:
+                    self.__signal_worker__(signal.SIGKILL)
+                except OSError:
+                    pass
+
+            self.__process__.join(1.0)
+            self.__process__ = None
+
+        if self.__connection__ is not None:
+            self.__connection__.close()
+            self.__connection__ = None
+
+    def restart(
+        self
+    ):
+        """
+        Stops and then starts the worker process.
+        """
+        self.stop()
+        self.start()
+
+    def send(
+        self,
+        message
+    ):
+        """
+        Sends a message to the worker process.
+        The message is handled before the worker's next update.
+        Only the process that owns the worker may send to it.
+
+        Returns: {bool} -- True if the message was sent.
+        """
+        if os.getpid() != self.__owner_pid__ or self.__connection__ is None:
+            return False
+
+        try:
+            self.__connection__.send(message)
+
+            return True
+        except (BrokenPipeError, OSError) as e:
+            self.log("{}: Unable to send to worker E={}".format(
+                self.__worker_name__,
+                e))
+
+        return False
+
+    def set_hang_timeout(
+        self,
+        hang_timeout: float
+    ):
+        """
+        Sets how long the worker may go without reporting before it is restarted.
+        """
+        self.__hang_timeout__ = hang_timeout
+
+    def is_alive(
+        self
+    ):
+        """
+        Is the worker process currently running?
+        """
+        return self.__process__ is not None and self.__process__.is_alive()
+
+    def is_hung(
+        self
+    ):
+        """
+        Has the worker gone quiet for longer than allowed?
+        """
+        if self.__last_heard__ is None:
+            return False
+
+        time_since_heard = datetime.datetime.utcnow() - self.__last_heard__
+
+        return time_since_heard.total_seconds() > self.__hang_timeout__
+
+    def service(
+        self
+    ):
+        """
+        Drains any states sent by the worker and restarts
+        the worker if it has died or stopped reporting.
+
+        Returns: The most recent state sent by the worker, None if nothing new arrived.
+        """
+        latest_state = None
+
+        try:
+            while self.__connection__ is not None and self.__connection__.poll():
+                latest_state = self.__connection__.recv()
+                self.__last_heard__ = datetime.datetime.utcnow()
+        except (EOFError, OSError) as e:
+            self.log("{}: Lost worker connection E={}".format(
+                self.__worker_name__,
+                e))
+
+        if not self.is_alive():
+            self.log("{}: Worker is not running, restarting.".format(
+                self.__worker_name__))
+            self.restart()
+        elif self.is_hung():
+            self.log("{}: Worker has not reported in {} seconds, restarting.".format(
+                self.__worker_name__,
+                self.__hang_timeout__))
+            self.restart()
+
+        return latest_state
+
+    def __init__(
+        self,
+        worker_name: str,
+        interval_callback,
+        update_callback,
+        state_callback,
+        hang_timeout: float,
+        logger: Logger = None,
+        message_callback=None,
+        startup_message_callback=None
+    ):
+        """
+        Creates a new worker.
+        The update callback is called in the worker process
+        at the interval returned by the interval callback,
+        and the result of the state callback is sent back to
+        the main process. Messages sent to the worker are
+        passed to the message callback inside the worker.
+        The result of the startup message callback is sent
+        to each new worker as soon as it starts.
+
+        The worker is a new interpreter, so the callbacks must be
+        module level functions (or static methods) it can import.
+        """
+
+        self.__worker_name__ = worker_name
+        self.__interval_callback__ = interval_callback
+        self.__update_callback__ = update_callback
+        self.__state_callback__ = state_callback
+        self.__message_callback__ = message_callback
+        self.__startup_message_callback__ = startup_message_callback
+        self.__hang_timeout__ = hang_timeout
+        self.__logger__ = logger
+        self.__owner_pid__ = os.getpid()
+        self.__context__ = __get_context__()
+        self.__process__ = None
+        self.__connection__ = None
+        self.__last_heard__ = None